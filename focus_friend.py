@@ -7,21 +7,56 @@ import platform
 import ctypes
 import shutil
 import time
-import schedule
+import math
 import threading
 from plyer import notification
 import re
-from datetime import datetime
-from collections import deque # For limited-size log
+import heapq
+import asyncio
+import json
+import argparse
+import fnmatch
+import functools
+import io
+import cProfile
+import pstats
+import tracemalloc
+import socket
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date, timedelta
+from collections import deque, namedtuple, OrderedDict # deque for limited-size log
+from urllib.parse import urlsplit
 
 # --- Configuration ---
 HOSTS_PATH_WINDOWS = r"C:\Windows\System32\drivers\etc\hosts"
 LOCALHOST_IP = "127.0.0.1"
 HOSTS_BACKUP_FILENAME = "hosts.focusapp.backup"
 TASKS_FILENAME = "focus_tasks.txt"
+ANALYTICS_DB_FILENAME = "focus_sessions.db" # Completed session records and rollups
+DEFAULT_SESSION_PROFILE = "default"
+STATS_DAYS_SHOWN = 14
+STATS_WEEKS_SHOWN = 8
 BLOCKED_SITES_FILENAME = "blocked_sites.txt"
 MAX_LOG_ENTRIES = 100
 SETTINGS_FILENAME = "focus_app_settings.txt" # To save theme preference
+TASK_PRIORITIES = {1: "Low", 2: "Normal", 3: "High"}
+DEFAULT_TASK_PRIORITY = 2
+TASK_INDEX_GRAM_SIZE = 3 # Substring index granularity (trigrams)
+QUERY_SERVICE_HOST = "127.0.0.1" # Loopback only; never exposed to the network
+QUERY_SERVICE_PORT = 47625
+QUERY_CACHE_SIZE = 4096 # Cached per-query lookup results
+QUERY_MAX_BATCH = 1000 # Max queries per request line
+QUERY_MAX_LINE_BYTES = 1024 * 1024
+VERIFY_CONCURRENCY = 64 # Parallel hostname lookups when verifying blocks
+VERIFY_TIMEOUT = 2.0 # Seconds per lookup
+VERIFY_DEADLINE_SLACK = 1.0 # Seconds on top of the whole run's expected time before giving up on the rest
+CLOCK_WAIT_SLICE = 1.0 # Max real wait before re-reading the clock (catches suspend/resume)
+SUSPEND_GAP_SECONDS = 5.0 # Timer callback this late => system was suspended (or badly stalled)
+HIDDEN_TIMER_POLL_SECONDS = 30.0 # Check interval while the countdown isn't visible
+TIMER_ALIGN_SLACK_MS = 5 # Redraw just after the displayed second changes, never just before
+PROFILE_FILENAME_PREFIX = "focus_profile"
+PROFILE_TOP_ENTRIES = 20 # Functions/allocation sites listed in each profile summary
 
 # Default list of websites if the file is empty or doesn't exist
 default_websites_to_block = [
@@ -36,14 +71,17 @@ default_websites_to_block = [
 ]
 
 # --- Global Variables ---
-scheduler_thread = None
-stop_scheduler = threading.Event()
-current_tasks = []
-websites_to_block = []
+clock = None # Clock used for all session timing, created below (swap with set_clock)
+hosts_path = HOSTS_PATH_WINDOWS # Hosts file to edit (a temp file when simulating)
+task_store = None # TaskStore, created below (UI thread only)
+session_analytics = None # SessionAnalytics, opened by the GUI (UI thread only)
+reminder_rotation = None # ReminderRotation, created below (thread-safe: UI and scheduler threads)
+session_state = None # SessionState snapshot, created below (read from any thread)
 hosts_backup_path = ""
 script_dir = ""
 activity_log = deque(maxlen=MAX_LOG_ENTRIES)
 app_instance = None
+profiling_enabled = False # Set by --profile or the UI switch
 
 # --- Style Configuration ---
 CORNER_RADIUS = 12
@@ -114,10 +152,83 @@ def get_script_directory():
 script_dir = get_script_directory()
 hosts_backup_path = os.path.join(script_dir, HOSTS_BACKUP_FILENAME)
 
+# --- Clock (injectable time source) ---
+# Monotonic clock that keeps counting while the machine is suspended, where the OS has one
+# (Linux CLOCK_BOOTTIME; macOS CLOCK_MONOTONIC). Otherwise plain time.monotonic().
+if hasattr(time, "CLOCK_BOOTTIME"): _SUSPEND_AWARE_CLOCK_ID = time.CLOCK_BOOTTIME
+elif sys.platform == "darwin" and hasattr(time, "CLOCK_MONOTONIC"): _SUSPEND_AWARE_CLOCK_ID = time.CLOCK_MONOTONIC
+else: _SUSPEND_AWARE_CLOCK_ID = None
+
+class SystemClock:
+    """Real time: wall clock for timestamps, suspend-aware monotonic clock for deadlines and intervals."""
+    def now(self): return time.time()
+    def monotonic(self):
+        if _SUSPEND_AWARE_CLOCK_ID is not None: return time.clock_gettime(_SUSPEND_AWARE_CLOCK_ID)
+        return time.monotonic()
+    def wait(self, event, timeout):
+        """Waits until event is set or timeout seconds pass. Returns True if the event was set.
+        Waits at most CLOCK_WAIT_SLICE at a time (callers re-check the clock), since the OS wait
+        timer may not count time spent suspended."""
+        return event.wait(timeout=min(max(0.0, timeout), CLOCK_WAIT_SLICE))
+    def wake(self): pass # Event.set() already wakes real waiters
+    def sleep(self, seconds): time.sleep(max(0.0, seconds))
+
+class SimulatedClock:
+    """Clock that only moves when advance() is called, for running sessions at accelerated speed.
+    Threads blocked in wait() wake in simulated time; settle() lets the driver wait until they
+    have caught up before advancing again, which keeps simulations deterministic."""
+
+    def __init__(self, start_wall_time=None):
+        self._now = 0.0
+        self._wall_start = time.time() if start_wall_time is None else start_wall_time
+        self._cond = threading.Condition()
+        self._waiting = {} # thread ident -> simulated deadline it is blocked until
+
+    def now(self): return self._wall_start + self._now
+    def monotonic(self): return self._now
+
+    def advance(self, seconds):
+        with self._cond:
+            self._now += seconds
+            self._cond.notify_all()
+
+    def wake(self):
+        with self._cond: self._cond.notify_all()
+
+    def wait(self, event, timeout):
+        me = threading.get_ident()
+        with self._cond:
+            deadline = self._now + max(0.0, timeout)
+            while not event.is_set() and self._now < deadline:
+                self._waiting[me] = deadline
+                self._cond.notify_all() # Lets settle() see this thread is parked
+                self._cond.wait()
+            self._waiting.pop(me, None)
+            self._cond.notify_all()
+        return event.is_set()
+
+    def sleep(self, seconds): self.wait(threading.Event(), seconds)
+
+    def settle(self, waiters, timeout=5.0):
+        """Blocks (in real time) until `waiters` threads are parked on deadlines still in the future."""
+        with self._cond:
+            return self._cond.wait_for(lambda: sum(1 for deadline in self._waiting.values() if deadline > self._now) >= waiters, timeout)
+
+clock = SystemClock()
+
+def set_clock(new_clock):
+    """Replaces the clock used by session timing, reminders and log timestamps."""
+    global clock
+    clock = new_clock
+
+def can_edit_hosts():
+    """Admin rights are only needed for the real system hosts file."""
+    return hosts_path != HOSTS_PATH_WINDOWS or is_admin()
+
 def add_log_message(message, level="info"):
     """Adds a timestamped message to the activity log and updates the GUI."""
     global activity_log, app_instance
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    timestamp = datetime.fromtimestamp(clock.now()).strftime("%Y-%m-%d %H:%M:%S")
     log_entry = f"[{timestamp}] [{level.upper()}] {message}"
     activity_log.appendleft(log_entry)
     if app_instance and hasattr(app_instance, 'log_textbox') and app_instance.log_textbox.winfo_exists():
@@ -136,11 +247,11 @@ def backup_hosts_file():
     if not os.path.exists(hosts_backup_path):
         try:
             add_log_message(f"Backing up hosts file to {HOSTS_BACKUP_FILENAME}...")
-            if not os.path.exists(HOSTS_PATH_WINDOWS):
-                 add_log_message(f"ERROR: Hosts file not found at {HOSTS_PATH_WINDOWS}", level="error")
-                 tkinter.messagebox.showerror("Backup Error", f"Windows hosts file not found at:\n{HOSTS_PATH_WINDOWS}")
+            if not os.path.exists(hosts_path):
+                 add_log_message(f"ERROR: Hosts file not found at {hosts_path}", level="error")
+                 tkinter.messagebox.showerror("Backup Error", f"Windows hosts file not found at:\n{hosts_path}")
                  return False
-            shutil.copy(HOSTS_PATH_WINDOWS, hosts_backup_path)
+            shutil.copy(hosts_path, hosts_backup_path)
             add_log_message("Backup successful.")
             return True
         except PermissionError:
@@ -161,11 +272,11 @@ def restore_hosts_file():
         return False
     try:
         add_log_message("Restoring hosts file from backup...")
-        os.makedirs(os.path.dirname(HOSTS_PATH_WINDOWS), exist_ok=True)
+        os.makedirs(os.path.dirname(hosts_path), exist_ok=True)
         try:
-            if os.path.exists(HOSTS_PATH_WINDOWS): os.remove(HOSTS_PATH_WINDOWS)
+            if os.path.exists(hosts_path): os.remove(hosts_path)
         except OSError as e: add_log_message(f"Warning: Could not remove current hosts file before restore: {e}", level="warning")
-        shutil.copy(hosts_backup_path, HOSTS_PATH_WINDOWS)
+        shutil.copy(hosts_backup_path, hosts_path)
         add_log_message("Hosts file restored.")
         flush_dns()
         return True
@@ -179,18 +290,18 @@ def restore_hosts_file():
         return False
 
 def block_websites_action():
-    global websites_to_block
-    if not is_admin(): add_log_message("Admin privileges required to block websites.", level="error"); return False
+    websites = [site for site in session_state.websites if is_host_rule(site)] # One consistent snapshot; the hosts file only takes hostnames
+    if not can_edit_hosts(): add_log_message("Admin privileges required to block websites.", level="error"); return False
     if not backup_hosts_file(): return False
     add_log_message("Applying website blocks...")
     added_count = 0
     try:
         existing_content = ""
-        if os.path.exists(HOSTS_PATH_WINDOWS):
-            with open(HOSTS_PATH_WINDOWS, 'r', encoding='utf-8', errors='ignore') as file_read: existing_content = file_read.read()
-        with open(HOSTS_PATH_WINDOWS, 'a', encoding='utf-8') as file_append:
+        if os.path.exists(hosts_path):
+            with open(hosts_path, 'r', encoding='utf-8', errors='ignore') as file_read: existing_content = file_read.read()
+        with open(hosts_path, 'a', encoding='utf-8') as file_append:
             if existing_content and not existing_content.endswith(('\n', '\r')): file_append.write('\n')
-            for site in websites_to_block:
+            for site in websites:
                 entry = f"{LOCALHOST_IP}\t{site}"
                 pattern = re.compile(rf"^\s*{re.escape(LOCALHOST_IP)}\s+{re.escape(site)}\s*$", re.MULTILINE)
                 if not pattern.search(existing_content):
@@ -210,25 +321,87 @@ def block_websites_action():
         return False
 
 def unblock_websites_action():
-    if not is_admin(): add_log_message("Admin privileges required to unblock websites.", level="error"); return False
+    if not can_edit_hosts(): add_log_message("Admin privileges required to unblock websites.", level="error"); return False
     return restore_hosts_file()
 
 def flush_dns():
+    if hosts_path != HOSTS_PATH_WINDOWS: return # Only the system hosts file affects the DNS cache
     add_log_message("Flushing DNS cache...")
     if platform.system() == "Windows":
         try: os.system("ipconfig /flushdns > nul") ; add_log_message("DNS cache flushed.")
         except Exception as e: add_log_message(f"Warning: Failed to flush DNS cache automatically: {e}", level="warning")
     else: add_log_message("DNS flush command only configured for Windows.", level="info")
 
-def send_task_reminder():
-    global current_tasks
-    task_to_remind = current_tasks[0] if current_tasks else None
-    if task_to_remind: message = f"Focus Reminder: Remember your task - {task_to_remind}"; log_msg = f"Reminder sent for task: {task_to_remind}"
-    else: message = "Focus Reminder: Stay on track!"; log_msg = "Generic focus reminder sent."
-    add_log_message(log_msg)
+def show_desktop_notification(message):
     try: notification.notify(title='Focus Session Reminder', message=message, app_name='Focus App', timeout=15)
     except Exception as e: add_log_message(f"Failed to send desktop notification: {e}", level="warning")
 
+# --- Block Verification ---
+def resolve_host_ipv4(host):
+    """Blocking IPv4 lookup through the system resolver (which honours the hosts file)."""
+    return {info[4][0] for info in socket.getaddrinfo(host, None, socket.AF_INET, socket.SOCK_STREAM)}
+
+async def _verify_blocks_async(hosts, resolver, concurrency, timeout):
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="block-verify")
+
+    async def check(host):
+        started = asyncio.Event()
+        def lookup():
+            loop.call_soon_threadsafe(started.set)
+            return resolver(host)
+        future = loop.run_in_executor(executor, lookup)
+        try:
+            # The timeout starts once a worker picks the lookup up. A stuck lookup keeps its worker
+            # busy, so later hosts wait for a free one instead of timing out while still queued.
+            await started.wait()
+            addresses = await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError: return host, f"lookup timed out after {timeout:.1f}s"
+        except Exception as e: return host, f"lookup failed: {e}"
+        if addresses and set(addresses) == {LOCALHOST_IP}: return host, None
+        return host, f"resolves to {', '.join(sorted(addresses)) or 'nothing'}"
+
+    # Stuck lookups hold their workers, so the run as a whole also needs a deadline
+    deadline = timeout * math.ceil(len(hosts) / concurrency) + VERIFY_DEADLINE_SLACK
+    tasks = [asyncio.ensure_future(check(host)) for host in hosts]
+    try: await asyncio.wait(tasks, timeout=deadline)
+    finally:
+        for task in tasks: task.cancel()
+        executor.shutdown(wait=False, cancel_futures=True) # Don't wait on stuck lookups
+    results = [task.result() if task.done() and not task.cancelled() else (host, "not checked (resolver busy)")
+               for host, task in zip(hosts, tasks)]
+    return {host: problem for host, problem in results if problem}
+
+def verify_blocks(hosts, resolver=resolve_host_ipv4, concurrency=VERIFY_CONCURRENCY, timeout=VERIFY_TIMEOUT):
+    """Resolves all hosts concurrently and returns {host: problem} for any not resolving to LOCALHOST_IP.
+    `resolver(host)` must return the host's addresses; pass a stand-in to test without real DNS."""
+    if not hosts: return {}
+    return asyncio.run(_verify_blocks_async(list(hosts), resolver, concurrency, timeout))
+
+def verify_blocks_in_background(hosts, resolver=resolve_host_ipv4):
+    """Runs verify_blocks on a worker thread and logs the outcome. Returns the thread."""
+    def run():
+        started = time.perf_counter()
+        try: problems = verify_blocks(hosts, resolver)
+        except Exception as e: add_log_message(f"Block verification failed: {e}", level="warning"); return
+        elapsed = time.perf_counter() - started
+        if not session_state.active: add_log_message("Block verification finished after the session ended; results ignored.")
+        elif not problems: add_log_message(f"Block verification: all {len(hosts)} sites resolve to {LOCALHOST_IP} ({elapsed:.2f}s).")
+        else:
+            add_log_message(f"Block verification: {len(problems)} of {len(hosts)} sites could not be confirmed as blocked ({elapsed:.2f}s).", level="warning")
+            for host, problem in sorted(problems.items())[:10]: add_log_message(f"Unconfirmed block: {host} ({problem})", level="warning")
+            if len(problems) > 10: add_log_message(f"...and {len(problems) - 10} more.", level="warning")
+    thread = threading.Thread(target=run, daemon=True, name="block-verify")
+    thread.start()
+    return thread
+
+def send_task_reminder(notify=show_desktop_notification):
+    task_to_remind = reminder_rotation.next_task(session_state)
+    if task_to_remind: message = f"Focus Reminder: Remember your task - {task_to_remind.text}"; log_msg = f"Reminder sent for task: {task_to_remind.text}"
+    else: message = "Focus Reminder: Stay on track!"; log_msg = "Generic focus reminder sent."
+    add_log_message(log_msg)
+    notify(message)
+
 def load_list_from_file(filename, default_list):
     file_path = os.path.join(script_dir, filename)
     items = []
@@ -286,19 +459,680 @@ def save_settings():
     except Exception as e:
         add_log_message(f"Error saving settings: {e}", level="error")
 
+# --- Task Store ---
+Task = namedtuple("Task", ["task_id", "text", "priority"])
+
+def _index_grams(text):
+    """Returns the set of fixed-size substrings used to index/look up text."""
+    text = text.lower()
+    return {text[i:i + TASK_INDEX_GRAM_SIZE] for i in range(len(text) - TASK_INDEX_GRAM_SIZE + 1)}
 
-def run_scheduler():
-    add_log_message("Scheduler thread started.")
-    while not stop_scheduler.is_set():
-        try: schedule.run_pending()
-        except Exception as e: add_log_message(f"Error in scheduler loop: {e}", level="error")
-        stop_requested = stop_scheduler.wait(timeout=1.0)
-        if stop_requested: break
-    add_log_message("Scheduler thread stopped.")
+class TaskStore:
+    """Focus tasks keyed by stable IDs, with priorities and an incremental substring index.
+    Edited on the UI thread only; other threads read the published SessionState instead."""
+
+    def __init__(self):
+        self._tasks = {} # task_id -> Task (insertion ordered)
+        self._ids_by_text = {} # lowercased text -> task_id, for duplicate checks
+        self._gram_index = {} # trigram -> set of task_ids containing it
+        self._next_id = 1
+        self._last_query = None # Last search query and its matching ids (reused while typing)
+        self._last_matches = None
+
+    def __len__(self): return len(self._tasks)
+
+    def get(self, task_id): return self._tasks.get(task_id)
+
+    def contains_text(self, text): return text.lower() in self._ids_by_text
+
+    def ordered(self):
+        """Returns all tasks, highest priority first, then in the order they were added."""
+        return sorted(self._tasks.values(), key=lambda task: (-task.priority, task.task_id))
+
+    def add(self, text, priority=DEFAULT_TASK_PRIORITY):
+        if priority not in TASK_PRIORITIES: priority = DEFAULT_TASK_PRIORITY
+        task = Task(self._next_id, text, priority)
+        self._next_id += 1
+        self._tasks[task.task_id] = task
+        self._ids_by_text[text.lower()] = task.task_id
+        for gram in _index_grams(text): self._gram_index.setdefault(gram, set()).add(task.task_id)
+        if self._last_query is not None and self._last_query in text.lower(): self._last_matches.add(task.task_id)
+        return task
+
+    def remove(self, task_id):
+        task = self._tasks.pop(task_id, None)
+        if task is None: return None
+        self._ids_by_text.pop(task.text.lower(), None)
+        for gram in _index_grams(task.text):
+            ids = self._gram_index.get(gram)
+            if ids is not None:
+                ids.discard(task_id)
+                if not ids: del self._gram_index[gram]
+        if self._last_matches is not None: self._last_matches.discard(task_id)
+        return task
+
+    def search(self, query):
+        """Returns tasks whose text contains query (case-insensitive), in display order.
+        When the query extends the previous one (typing), only the previous matches are re-checked."""
+        query = query.strip().lower()
+        if not query:
+            self._last_query = self._last_matches = None
+            return self.ordered()
+        if self._last_query is not None and self._last_query in query:
+            candidates = self._last_matches
+        elif len(query) >= TASK_INDEX_GRAM_SIZE:
+            gram_sets = sorted((self._gram_index.get(gram, set()) for gram in _index_grams(query)), key=len)
+            candidates = set.intersection(*gram_sets) if gram_sets[0] else set()
+        else:
+            candidates = self._tasks.keys()
+        matches = {task_id for task_id in candidates if query in self._tasks[task_id].text.lower()}
+        self._last_query, self._last_matches = query, matches
+        return sorted((self._tasks[task_id] for task_id in matches), key=lambda task: (-task.priority, task.task_id))
+
+class ReminderRotation:
+    """Picks the next task to remind about, rotating across all tasks.
+    Uses stride scheduling on a heap: higher priority tasks come up proportionally more often."""
+
+    def __init__(self):
+        self._heap = [] # (pass_value, -priority, task_id); stale entries are skipped lazily
+        self._pass = {} # task_id -> pass value of its live heap entry
+        self._current_pass = 0.0
+        self._tasks = {} # task_id -> Task from the last synced SessionState
+        self._synced_version = None
+        self._lock = threading.Lock() # A stopping session's scheduler thread can overlap the next session's
+
+    def _sync(self, state):
+        """Queues newly added tasks so they are reminded next; removed tasks drop out when popped."""
+        if self._synced_version == state.version: return
+        self._tasks = {task.task_id: task for task in state.tasks}
+        for task in state.tasks:
+            if task.task_id not in self._pass:
+                self._pass[task.task_id] = self._current_pass
+                heapq.heappush(self._heap, (self._current_pass, -task.priority, task.task_id))
+        self._synced_version = state.version
+
+    def next_task(self, state):
+        with self._lock:
+            self._sync(state)
+            while self._heap:
+                pass_value, _, task_id = heapq.heappop(self._heap)
+                task = self._tasks.get(task_id)
+                if task is None or self._pass.get(task_id) != pass_value:
+                    if task is None: self._pass.pop(task_id, None)
+                    continue
+                self._current_pass = pass_value
+                next_pass = pass_value + 1.0 / task.priority
+                self._pass[task_id] = next_pass
+                heapq.heappush(self._heap, (next_pass, -task.priority, task_id))
+                return task
+            return None
+
+def load_task_store():
+    """Loads tasks from TASKS_FILENAME. Lines are 'priority<TAB>text'; plain lines use the default priority."""
+    store = TaskStore()
+    for line in load_list_from_file(TASKS_FILENAME, []):
+        priority_text, sep, text = line.partition('\t')
+        if sep and priority_text.isdigit() and text.strip(): priority, text = int(priority_text), text.strip()
+        else: priority, text = DEFAULT_TASK_PRIORITY, line
+        if not store.contains_text(text): store.add(text, priority)
+    return store
+
+def save_task_store():
+    save_list_to_file(TASKS_FILENAME, [f"{task.priority}\t{task.text}" for task in session_state.tasks])
+
+# --- Session State (copy-on-write snapshots) ---
+class SessionState(namedtuple("SessionState", ["version", "tasks", "websites", "active"])):
+    """Immutable view of the session's tasks (display order), blocked sites (sorted) and
+    whether a focus session is currently blocking them.
+    Edits never mutate a snapshot; they publish a new one, so background threads can read
+    `session_state` once and use it without locks."""
+    __slots__ = ()
+
+_session_state_lock = threading.Lock() # Serializes writers only; readers never take it
+
+def publish_session_state(tasks=None, websites=None, active=None):
+    """Atomically replaces the global snapshot, keeping any part that is not given."""
+    global session_state
+    with _session_state_lock:
+        current = session_state
+        new_state = SessionState(current.version + 1,
+                                 tuple(tasks) if tasks is not None else current.tasks,
+                                 tuple(sorted(set(websites))) if websites is not None else current.websites,
+                                 active if active is not None else current.active)
+        session_state = new_state
+    return new_state
+
+task_store = TaskStore()
+reminder_rotation = ReminderRotation()
+session_state = SessionState(0, (), (), False)
+
+# --- Block Rules (compiled pattern matcher) ---
+# Block list entries are plain hostnames (written to the hosts file) or, for the query service only:
+#   reddit.com/r/all   host + path prefix
+#   *shorts*           keyword anywhere in host/path
+#   *shorts/*/live     other * globs over host/path (? and [...] also work inside them)
+#   re:^youtube\.com/(shorts|feed)   regular expression over host/path
+def parse_block_rule(rule):
+    """Classifies a block list entry as ('host'|'prefix'|'keyword'|'regex', value)."""
+    if rule.startswith("re:"): return "regex", rule[3:]
+    if "*" in rule: # A lone ? is more likely a pasted query string than a wildcard
+        keyword = rule.strip("*")
+        if rule.startswith("*") and rule.endswith("*") and keyword and not any(c in keyword for c in "*?["): return "keyword", keyword
+        return "regex", r"\A" + fnmatch.translate(rule)
+    if "/" in rule: return "prefix", re.split(r"[?#]", rule, 1)[0].rstrip("/")
+    return "host", rule
+
+def is_host_rule(rule): return parse_block_rule(rule)[0] == "host"
+
+_GROUP_NUMBER_REF = re.compile(r"\\[1-9]|\(\?\(\d") # \1 backreferences and (?(1)...) conditionals
+
+def uses_group_numbers(pattern):
+    """True if a regex refers to its groups by number, which a merged alternation would renumber.
+    May also flag an escaped backslash followed by a digit; such rules are just matched one by one."""
+    return bool(_GROUP_NUMBER_REF.search(pattern))
+
+def is_valid_block_rule(rule):
+    kind, value = parse_block_rule(rule)
+    if kind != "regex": return True
+    try: re.compile(value); return True
+    except re.error: return False
+
+def normalize_query_target(query):
+    """Returns 'host/path' (lowercase, no scheme, port or query string) for a bare host or URL, or '' if it has no host."""
+    query = query.strip()
+    if "://" not in query: query = "//" + query
+    try:
+        parts = urlsplit(query)
+        host = (parts.hostname or "").rstrip(".")
+    except ValueError: return ""
+    if not host: return ""
+    return host + (parts.path.lower() if parts.path not in ("", "/") else "")
+
+class AhoCorasick:
+    """Multi-literal substring matcher. Literals are inserted into the trie as they are added;
+    failure links are rebuilt lazily on the next search, and removed literals are compacted away
+    once they outnumber the live ones."""
+
+    def __init__(self):
+        self._goto = [{}] # node -> {char: child node}
+        self._fail = [0]
+        self._own = [[]] # node -> keys whose literal ends at this node
+        self._out = [[]] # node -> keys ending here, including via failure links (built by _link)
+        self._literals = {} # live key -> literal
+        self._stale = 0 # removed keys still present in the trie
+        self._dirty = False
+
+    def __len__(self): return len(self._literals)
+
+    def add(self, key, literal):
+        if key in self._literals or not literal: return
+        node = 0
+        for ch in literal:
+            child = self._goto[node].get(ch)
+            if child is None:
+                child = len(self._goto)
+                self._goto[node][ch] = child
+                self._goto.append({}); self._fail.append(0); self._own.append([]); self._out.append([])
+            node = child
+        if key in self._own[node]: self._stale -= 1 # Re-added after removal
+        else: self._own[node].append(key)
+        self._literals[key] = literal
+        self._dirty = True
+
+    def remove(self, key):
+        if self._literals.pop(key, None) is None: return
+        self._stale += 1
+        if self._stale > len(self._literals):
+            literals = self._literals
+            self.__init__()
+            for live_key, literal in literals.items(): self.add(live_key, literal)
+
+    def _link(self):
+        queue = deque()
+        for child in self._goto[0].values():
+            self._fail[child] = 0; self._out[child] = self._own[child]; queue.append(child)
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]: fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                self._out[child] = self._own[child] + self._out[self._fail[child]]
+                queue.append(child)
+        self._dirty = False
+
+    def iter_matches(self, text):
+        """Yields (key, start_index) for every live literal occurring in text."""
+        if self._dirty: self._link()
+        goto, fail, out, literals = self._goto, self._fail, self._out, self._literals
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]: node = fail[node]
+            node = goto[node].get(ch, 0)
+            for key in out[node]:
+                literal = literals.get(key)
+                if literal is not None: yield key, i - len(literal) + 1
+
+class BlockRuleMatcher:
+    """Matches a 'host/path' target against all block rules at once: a set for hostnames,
+    one Aho-Corasick automaton for path prefixes and keywords, and one merged regex
+    alternation for regex/glob rules (except those using numbered group references, which
+    are matched one by one). update() applies only the difference between rule sets."""
+
+    def __init__(self):
+        self._rules = set()
+        self._hosts = set()
+        self._automaton = AhoCorasick()
+        self._prefixes = {} # prefix rule -> literal (must match at the start of the target)
+        self._regex_rules = {} # rule -> compiled regex, matched through the merged alternation
+        self._numbered_regex_rules = {} # rule -> compiled regex with \1 or (?(1)...), matched separately
+        self._merged_regex = None
+        self._regex_dirty = False
+
+    def __len__(self): return len(self._rules)
+
+    def update(self, rules):
+        rules = set(rules)
+        for rule in self._rules - rules: self.remove_rule(rule)
+        for rule in rules - self._rules: self.add_rule(rule)
+
+    def add_rule(self, rule):
+        if rule in self._rules: return
+        kind, value = parse_block_rule(rule)
+        if kind == "host": self._hosts.add(value)
+        elif kind == "prefix": self._prefixes[rule] = value; self._automaton.add(rule, value)
+        elif kind == "keyword": self._automaton.add(rule, value)
+        else:
+            try: regex = re.compile(value, re.IGNORECASE) # Targets are lowercased; rules keep their case
+            except re.error as e: add_log_message(f"Ignoring invalid block pattern '{rule}': {e}", level="warning"); return
+            if uses_group_numbers(value): self._numbered_regex_rules[rule] = regex
+            else: self._regex_rules[rule] = regex; self._regex_dirty = True
+        self._rules.add(rule)
+
+    def remove_rule(self, rule):
+        if rule not in self._rules: return
+        self._rules.discard(rule)
+        kind, value = parse_block_rule(rule)
+        if kind == "host": self._hosts.discard(value)
+        elif kind in ("prefix", "keyword"): self._prefixes.pop(rule, None); self._automaton.remove(rule)
+        elif self._regex_rules.pop(rule, None) is not None: self._regex_dirty = True
+        else: self._numbered_regex_rules.pop(rule, None)
+
+    def _compile_regex(self):
+        sources = [regex.pattern for regex in self._regex_rules.values()]
+        try: self._merged_regex = re.compile("|".join(f"(?:{source})" for source in sources), re.IGNORECASE) if sources else None
+        except re.error: self._merged_regex = False # e.g. clashing group names; fall back to one-by-one
+        self._regex_dirty = False
+
+    def match(self, target):
+        """Returns the first rule matching target ('host/path' from normalize_query_target), or None."""
+        if not target: return None
+        host = target.split("/", 1)[0]
+        if host in self._hosts: return host
+        for rule, start in self._automaton.iter_matches(target):
+            literal = self._prefixes.get(rule)
+            if literal is None: return rule # Keyword: anywhere
+            if start == 0 and target[len(literal):len(literal) + 1] in ("", "/"): return rule
+        if self._regex_dirty: self._compile_regex()
+        if self._merged_regex is False or (self._merged_regex and self._merged_regex.search(target)):
+            rule = next((rule for rule, regex in self._regex_rules.items() if regex.search(target)), None)
+            if rule: return rule
+        return next((rule for rule, regex in self._numbered_regex_rules.items() if regex.search(target)), None)
+
+# --- Local Query Service ("is this host blocked?") ---
+class LRUCache:
+    """Small least-recently-used cache. Not thread-safe; owned by one thread/event loop."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self.hits = self.misses = 0
+
+    def __len__(self): return len(self._data)
+
+    def get(self, key, default=None):
+        try: value = self._data[key]
+        except KeyError: self.misses += 1; return default
+        self._data.move_to_end(key); self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._data[key] = value; self._data.move_to_end(key)
+        if len(self._data) > self.maxsize: self._data.popitem(last=False)
+
+    def clear(self): self._data.clear()
+
+class BlockQueryService:
+    """Answers batched "is this host/URL blocked?" queries over a local socket.
+
+    Hosts and URLs are matched against all block rules (see BlockRuleMatcher).
+    Protocol: one JSON object per line, {"id": <any>, "queries": ["youtube.com", "https://..."]},
+    answered with {"id": <same>, "active": <session running>, "blocked": [bool, ...]}.
+    Runs its own asyncio loop on a background thread and reads the lock-free SessionState;
+    the lookup cache is dropped whenever the block list snapshot changes."""
+
+    def __init__(self, cache_size=QUERY_CACHE_SIZE):
+        self.cache = LRUCache(cache_size)
+        self.address = None
+        self._indexed_websites = None # SessionState.websites tuple the index was built from
+        self._matcher = BlockRuleMatcher()
+        self._loop = None
+        self._server = None
+        self._thread = None
+
+    def _refresh_index(self, state):
+        if state.websites is not self._indexed_websites:
+            self._matcher.update(state.websites)
+            self._indexed_websites = state.websites
+            self.cache.clear()
+
+    def lookup(self, queries, state=None):
+        """Returns one bool per query: blocked by the current session."""
+        state = state or session_state
+        self._refresh_index(state)
+        results = []
+        for query in queries:
+            matched = self.cache.get(query)
+            if matched is None:
+                matched = self._matcher.match(normalize_query_target(query)) is not None
+                self.cache.put(query, matched)
+            results.append(state.active and matched)
+        return results
+
+    def handle_request_line(self, line):
+        """Parses one request line and returns the encoded response line."""
+        request = None
+        try:
+            request = json.loads(line)
+            queries = request["queries"]
+            if not isinstance(queries, list) or not all(isinstance(query, str) for query in queries):
+                raise ValueError("'queries' must be a list of strings")
+            if len(queries) > QUERY_MAX_BATCH: raise ValueError(f"at most {QUERY_MAX_BATCH} queries per request")
+        except (ValueError, KeyError, TypeError) as e:
+            response = {"error": f"Bad request: {e}"}
+        else:
+            state = session_state
+            response = {"active": state.active, "blocked": self.lookup(queries, state)}
+        if isinstance(request, dict) and "id" in request: response["id"] = request["id"]
+        return (json.dumps(response) + "\n").encode("utf-8")
+
+    async def _handle_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line: break
+                writer.write(self.handle_request_line(line))
+                await writer.drain()
+        except (ConnectionError, ValueError): pass # Client went away or sent an oversized line
+        finally: writer.close()
+
+    def start(self, host=QUERY_SERVICE_HOST, port=QUERY_SERVICE_PORT, unix_path=None):
+        """Starts serving on a background thread. Returns the bound address, or None on failure."""
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(host, port, unix_path, ready), daemon=True)
+        self._thread.start()
+        ready.wait(timeout=5.0)
+        return self.address
+
+    def _run(self, host, port, unix_path, ready):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            if unix_path: server_coro = asyncio.start_unix_server(self._handle_client, path=unix_path, limit=QUERY_MAX_LINE_BYTES)
+            else: server_coro = asyncio.start_server(self._handle_client, host, port, limit=QUERY_MAX_LINE_BYTES)
+            self._server = self._loop.run_until_complete(server_coro)
+            self.address = self._server.sockets[0].getsockname()
+            add_log_message(f"Query service listening on {self.address}.")
+        except Exception as e:
+            add_log_message(f"ERROR: Could not start query service: {e}", level="error")
+            self._loop.close(); ready.set()
+            return
+        ready.set()
+        self._loop.run_forever()
+        self._server.close()
+        pending = asyncio.all_tasks(self._loop)
+        for task in pending: task.cancel()
+        self._loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        self._loop.close()
+        add_log_message("Query service stopped.")
+
+    def stop(self):
+        if self._thread and self._thread.is_alive():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=2.0)
+
+
+# --- Focus Session (lifecycle independent of the GUI) ---
+class FocusSession:
+    """One focus session: apply blocks, send reminders on a scheduler thread, restore when stopped.
+    All timing goes through the module clock, so the same code runs in the app and in simulations."""
+
+    def __init__(self, duration_min, reminder_min, notify=show_desktop_notification, profile=DEFAULT_SESSION_PROFILE):
+        self.clock = clock
+        self.duration = duration_min * 60
+        self.reminder_interval = reminder_min * 60
+        self.notify = notify
+        self.profile = profile
+        self.started_at = None # Wall-clock start (for display/records)
+        self.deadline = None # Monotonic end time
+        self.reminder_count = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Applies website blocks and starts reminders. Returns False if blocking failed."""
+        if not block_websites_action(): return False
+        publish_session_state(active=True)
+        if hosts_path == HOSTS_PATH_WINDOWS: # The system resolver only reflects the real hosts file
+            verify_blocks_in_background([site for site in session_state.websites if is_host_rule(site)])
+        self.started_at = self.clock.now()
+        self.deadline = self.clock.monotonic() + self.duration
+        self._send_reminder()
+        self._thread = threading.Thread(target=self._run_scheduler, daemon=True)
+        self._thread.start()
+        return True
+
+    def remaining(self):
+        return max(0.0, self.deadline - self.clock.monotonic()) if self.deadline is not None else 0.0
+
+    def is_over(self): return self.deadline is not None and self.clock.monotonic() >= self.deadline
+
+    def elapsed(self): return self.duration - self.remaining() if self.deadline is not None else 0.0
+
+    def _send_reminder(self):
+        self.reminder_count += 1
+        send_task_reminder(self.notify)
+
+    def _run_scheduler(self):
+        add_log_message("Scheduler thread started.")
+        next_due = self.clock.monotonic() + self.reminder_interval
+        while not self.clock.wait(self._stop_event, next_due - self.clock.monotonic()):
+            if self.clock.monotonic() < next_due: continue
+            if self.is_over(): break # At or past the end (e.g. woke after a suspend): no more reminders
+            try: self._send_reminder()
+            except Exception as e: add_log_message(f"Error in scheduler loop: {e}", level="error")
+            next_due += self.reminder_interval
+            while next_due <= self.clock.monotonic(): next_due += self.reminder_interval # Missed while suspended: one reminder, not a burst
+        add_log_message("Scheduler thread stopped.")
+
+    def stop_scheduler(self, timeout=2.0):
+        self._stop_event.set(); self.clock.wake()
+        if self._thread and self._thread.is_alive():
+            add_log_message("Waiting for scheduler thread..."); self._thread.join(timeout=timeout)
+            if self._thread.is_alive(): add_log_message("Warning: Scheduler thread did not stop cleanly.", level="warning")
+
+    def stop(self, restore_hosts=True):
+        """Stops reminders and, if asked, restores the hosts file. Returns False if the restore failed."""
+        self.stop_scheduler()
+        restored = unblock_websites_action() if restore_hosts else True
+        publish_session_state(active=False)
+        return restored
+
+# --- Session Analytics ---
+ANALYTICS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    started_at REAL NOT NULL,      -- Unix time
+    ended_at REAL NOT NULL,
+    planned_seconds REAL NOT NULL,
+    actual_seconds REAL NOT NULL,
+    profile TEXT NOT NULL,
+    reminder_count INTEGER NOT NULL,
+    completed INTEGER NOT NULL     -- 1 if the session ran to its end
+);
+CREATE TABLE IF NOT EXISTS daily_rollup (
+    day TEXT PRIMARY KEY,          -- YYYY-MM-DD (local time)
+    sessions INTEGER NOT NULL,
+    focus_seconds REAL NOT NULL,
+    planned_seconds REAL NOT NULL,
+    cum_sessions INTEGER NOT NULL, -- Running totals through this day, for O(1) range sums
+    cum_focus_seconds REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS weekly_rollup (
+    week TEXT PRIMARY KEY,         -- ISO week, YYYY-Www
+    sessions INTEGER NOT NULL,
+    focus_seconds REAL NOT NULL,
+    planned_seconds REAL NOT NULL
+);
+"""
+
+def iso_week_key(day):
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02d}"
+
+def split_by_day(start_ts, seconds):
+    """Splits an interval starting at Unix time start_ts into [(local date, seconds)] pieces."""
+    pieces = []
+    end_ts = start_ts + seconds
+    day = datetime.fromtimestamp(start_ts).date()
+    while True:
+        # Measure between Unix timestamps, so a DST change on the way doesn't add or lose an hour
+        midnight_ts = datetime.combine(day + timedelta(days=1), datetime.min.time()).timestamp()
+        if midnight_ts >= end_ts: break
+        pieces.append((day, midnight_ts - start_ts))
+        start_ts, day = midnight_ts, day + timedelta(days=1)
+    pieces.append((day, end_ts - start_ts))
+    return pieces
+
+class SessionAnalytics:
+    """Completed-session records in a local SQLite file, with daily and weekly rollups updated in
+    the same transaction as each insert. Daily rows also carry running totals, so totals over any
+    date range take two indexed lookups no matter how much history there is."""
+
+    def __init__(self, db_path):
+        self.db = sqlite3.connect(db_path)
+        self.db.executescript(ANALYTICS_SCHEMA)
+
+    def close(self): self.db.close()
+
+    def record_session(self, started_at, ended_at, planned_seconds, actual_seconds, reminder_count, profile=DEFAULT_SESSION_PROFILE, completed=False):
+        start_day = datetime.fromtimestamp(started_at).date() # split_by_day(started_at, ...) starts here too
+        with self.db: # One transaction: the record and its rollups land together or not at all
+            self.db.execute("INSERT INTO sessions (started_at, ended_at, planned_seconds, actual_seconds, profile, reminder_count, completed) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            (started_at, ended_at, planned_seconds, actual_seconds, profile, reminder_count, int(completed)))
+            # Focus time is split across midnight; the session itself counts on the day it started
+            for day, seconds in split_by_day(started_at, actual_seconds):
+                is_start_day = day == start_day
+                self._add_to_rollups(day, 1 if is_start_day else 0, seconds, planned_seconds if is_start_day else 0.0)
+
+    def _add_to_rollups(self, day, sessions, focus_seconds, planned_seconds):
+        day_key = day.isoformat()
+        updated = self.db.execute("UPDATE daily_rollup SET sessions = sessions + ?, focus_seconds = focus_seconds + ?, planned_seconds = planned_seconds + ?, "
+                                  "cum_sessions = cum_sessions + ?, cum_focus_seconds = cum_focus_seconds + ? WHERE day = ?",
+                                  (sessions, focus_seconds, planned_seconds, sessions, focus_seconds, day_key)).rowcount
+        if not updated:
+            prev_sessions, prev_seconds = self._totals_through(day - timedelta(days=1))
+            self.db.execute("INSERT INTO daily_rollup VALUES (?, ?, ?, ?, ?, ?)",
+                            (day_key, sessions, focus_seconds, planned_seconds, prev_sessions + sessions, prev_seconds + focus_seconds))
+        # Running totals of later days only change for back-dated records (e.g. after a clock change)
+        self.db.execute("UPDATE daily_rollup SET cum_sessions = cum_sessions + ?, cum_focus_seconds = cum_focus_seconds + ? WHERE day > ?",
+                        (sessions, focus_seconds, day_key))
+        self.db.execute("INSERT INTO weekly_rollup VALUES (?, ?, ?, ?) ON CONFLICT(week) DO UPDATE SET "
+                        "sessions = sessions + excluded.sessions, focus_seconds = focus_seconds + excluded.focus_seconds, planned_seconds = planned_seconds + excluded.planned_seconds",
+                        (iso_week_key(day), sessions, focus_seconds, planned_seconds))
+
+    def _totals_through(self, day):
+        row = self.db.execute("SELECT cum_sessions, cum_focus_seconds FROM daily_rollup WHERE day <= ? ORDER BY day DESC LIMIT 1", (day.isoformat(),)).fetchone()
+        return row if row else (0, 0.0)
+
+    def totals_between(self, first_day, last_day):
+        """Returns (sessions, focus_seconds) for the inclusive date range."""
+        end_sessions, end_seconds = self._totals_through(last_day)
+        start_sessions, start_seconds = self._totals_through(first_day - timedelta(days=1))
+        return end_sessions - start_sessions, end_seconds - start_seconds
+
+    def daily_totals(self, first_day, last_day):
+        """Returns {date: (sessions, focus_seconds)} for days in range that have data."""
+        rows = self.db.execute("SELECT day, sessions, focus_seconds FROM daily_rollup WHERE day BETWEEN ? AND ?", (first_day.isoformat(), last_day.isoformat()))
+        return {date.fromisoformat(day): (sessions, seconds) for day, sessions, seconds in rows}
+
+    def weekly_totals(self, first_day, last_day):
+        """Returns {'YYYY-Www': (sessions, focus_seconds)} for ISO weeks overlapping the range."""
+        rows = self.db.execute("SELECT week, sessions, focus_seconds FROM weekly_rollup WHERE week BETWEEN ? AND ?", (iso_week_key(first_day), iso_week_key(last_day)))
+        return {week: (sessions, seconds) for week, sessions, seconds in rows}
+
+def open_session_analytics():
+    try: return SessionAnalytics(os.path.join(script_dir, ANALYTICS_DB_FILENAME))
+    except sqlite3.Error as e:
+        add_log_message(f"Error opening {ANALYTICS_DB_FILENAME}: {e}. Session statistics disabled.", level="error")
+        return None
+
+# --- Profiling (--profile / UI switch) ---
+_profile_lock = threading.Lock() # Only one profiled section at a time (cProfile can't nest)
+
+def profiled(name):
+    """Decorator: while profiling is enabled, records cProfile and tracemalloc data for each call
+    and writes a summary file. When disabled it only checks a flag; no profiler is created."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profiling_enabled or not _profile_lock.acquire(blocking=False): return func(*args, **kwargs)
+            try: return _run_profiled(name, func, args, kwargs)
+            finally: _profile_lock.release()
+        return wrapper
+    return decorator
+
+def _run_profiled(name, func, args, kwargs):
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing: tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    try: return profiler.runcall(func, *args, **kwargs)
+    finally:
+        elapsed = time.perf_counter() - started
+        after = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        if started_tracing: tracemalloc.stop()
+        write_profile_report(name, elapsed, profiler, after.compare_to(before, "lineno"), current, peak)
+
+def write_profile_report(name, elapsed, profiler, allocation_diffs, current, peak):
+    """Writes <prefix>_<name>_<timestamp>.prof (raw pstats) and .txt (summary) to the script directory."""
+    base_path = os.path.join(script_dir, f"{PROFILE_FILENAME_PREFIX}_{name}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}")
+    try:
+        profiler.dump_stats(base_path + ".prof")
+        stats_text = io.StringIO()
+        pstats.Stats(profiler, stream=stats_text).sort_stats("cumulative").print_stats(PROFILE_TOP_ENTRIES)
+        with open(base_path + ".txt", 'w', encoding='utf-8') as f:
+            f.write(f"Profile: {name}\nRecorded: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\nWall time: {elapsed * 1000:.1f} ms\n")
+            f.write(f"Traced memory: {current / 1024:.1f} KiB current, {peak / 1024:.1f} KiB peak\n\n")
+            f.write(f"--- Top {PROFILE_TOP_ENTRIES} allocation changes (by line) ---\n")
+            for diff in allocation_diffs[:PROFILE_TOP_ENTRIES]: f.write(f"{diff}\n")
+            f.write(f"\n--- Top {PROFILE_TOP_ENTRIES} functions (cumulative time) ---\n")
+            f.write(stats_text.getvalue())
+        add_log_message(f"Profile for {name} written to {os.path.basename(base_path)}.txt ({elapsed * 1000:.0f} ms).")
+    except Exception as e:
+        add_log_message(f"Error writing profile for {name}: {e}", level="error")
+
+def set_profiling(enabled):
+    global profiling_enabled
+    profiling_enabled = enabled
+    add_log_message(f"Profiling {'enabled' if enabled else 'disabled'}.")
 
 # --- Main Application Class ---
 class FocusAppGUI(ctk.CTk):
 
+    @profiled("startup")
     def __init__(self):
         super().__init__()
         global app_instance, active_theme_name
@@ -315,13 +1149,16 @@ class FocusAppGUI(ctk.CTk):
         self.configure(fg_color=self.current_theme_colors["background"])
 
         self.is_running = False
-        self.session_end_time = None
+        self.session = None # FocusSession while running
+        self._timer_job = None # Pending after() id for update_timer
+        self._timer_expected_at = None # Session-clock time the pending update_timer should run
 
         # --- Load Data ---
-        global current_tasks, websites_to_block
+        global task_store, session_analytics
         add_log_message("Application starting...")
-        current_tasks = load_list_from_file(TASKS_FILENAME, [])
-        websites_to_block = load_list_from_file(BLOCKED_SITES_FILENAME, default_websites_to_block)
+        task_store = load_task_store()
+        session_analytics = open_session_analytics()
+        publish_session_state(tasks=task_store.ordered(), websites=load_list_from_file(BLOCKED_SITES_FILENAME, default_websites_to_block))
 
         # --- Check Admin Rights ---
         if platform.system() == "Windows":
@@ -367,9 +1204,25 @@ class FocusAppGUI(ctk.CTk):
                                           font=ctk.CTkFont(family=FONT_FAMILY, size=FONT_SIZE_SMALL))
         self.theme_switch.grid(row=0, column=1, padx=(0, 5), pady=5, sticky="e")
 
+        self.profile_switch_var = ctk.BooleanVar(value=profiling_enabled)
+        self.profile_switch = ctk.CTkSwitch(self.bottom_frame,
+                                            text="Profile",
+                                            command=lambda: set_profiling(self.profile_switch_var.get()),
+                                            variable=self.profile_switch_var,
+                                            onvalue=True, offvalue=False,
+                                            progress_color=self.current_theme_colors["button_hover"],
+                                            fg_color=self.current_theme_colors["button_secondary"],
+                                            button_color=self.current_theme_colors["button"],
+                                            button_hover_color=self.current_theme_colors["button_hover"],
+                                            text_color=self.current_theme_colors["text"],
+                                            font=ctk.CTkFont(family=FONT_FAMILY, size=FONT_SIZE_SMALL))
+        self.profile_switch.grid(row=0, column=2, padx=(10, 5), pady=5, sticky="e")
+
 
         # --- Handle Window Closing ---
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
+        # Redraw the countdown as soon as the window is restored (children's <Map> events also reach this binding)
+        self.bind("<Map>", lambda event: self._reschedule_timer() if event.widget is self else None)
         add_log_message("Application initialized.")
         # Apply initial theme styles thoroughly after all widgets created
         self._apply_theme_to_widgets()
@@ -391,17 +1244,20 @@ class FocusAppGUI(ctk.CTk):
                                        segmented_button_selected_hover_color=self.current_theme_colors["button_hover"],
                                        segmented_button_unselected_color=self.current_theme_colors["widget_bg"],
                                        segmented_button_unselected_hover_color=self.current_theme_colors["accent"],
-                                       text_color=self.current_theme_colors["text"]
+                                       text_color=self.current_theme_colors["text"],
+                                       command=self._on_tab_changed
                                        )
          self.tab_view.grid(row=0, column=0, padx=15, pady=15, sticky="nsew")
          self.tab_view.add("Session")
          self.tab_view.add("Blocked Sites")
+         self.tab_view.add("Statistics")
          self.tab_view.add("Activity Log")
 
     def _create_all_tabs_content(self):
          """Calls the creation methods for the content of all tabs."""
          self._create_focus_session_tab()
          self._create_blocked_sites_tab()
+         self._create_statistics_tab()
          self._create_activity_log_tab()
 
 
@@ -449,6 +1305,22 @@ class FocusAppGUI(ctk.CTk):
                              corner_radius=CORNER_RADIUS,
                              font=ctk.CTkFont(family=FONT_FAMILY, size=FONT_SIZE_NORMAL))
 
+    def _create_styled_option_menu(self, parent, values, variable, width=100):
+         """Helper to create consistently styled option menus."""
+         return ctk.CTkOptionMenu(parent,
+                                  values=values,
+                                  variable=variable,
+                                  width=width,
+                                  fg_color=self.current_theme_colors["button"],
+                                  button_color=self.current_theme_colors["button_hover"],
+                                  button_hover_color=self.current_theme_colors["button_hover"],
+                                  text_color=self.current_theme_colors["text"],
+                                  dropdown_fg_color=self.current_theme_colors["widget_bg"],
+                                  dropdown_text_color=self.current_theme_colors["text"],
+                                  dropdown_hover_color=self.current_theme_colors["accent"],
+                                  corner_radius=CORNER_RADIUS,
+                                  font=ctk.CTkFont(family=FONT_FAMILY, size=FONT_SIZE_NORMAL))
+
 
     def _create_focus_session_tab(self):
         """Creates widgets for the Focus Session tab."""
@@ -496,32 +1368,40 @@ class FocusAppGUI(ctk.CTk):
         self.task_frame = self._create_styled_frame(self.tab_focus)
         self.task_frame.grid(row=3, column=0, padx=10, pady=10, sticky="nsew")
         self.task_frame.grid_columnconfigure(0, weight=1)
-        self.task_frame.grid_rowconfigure(1, weight=1)
+        self.task_frame.grid_rowconfigure(2, weight=1)
 
         self._create_styled_label(self.task_frame, text="Focus Tasks", size=FONT_SIZE_LARGE, weight="bold").grid(row=0, column=0, columnspan=3, padx=10, pady=(10, 5))
 
+        self.task_filter_entry = self._create_styled_entry(self.task_frame, placeholder="Filter tasks...")
+        self.task_filter_entry.grid(row=1, column=0, columnspan=3, padx=10, pady=(0, 5), sticky="ew")
+        self.task_filter_entry.bind("<KeyRelease>", lambda event: self.refresh_task_listbox())
+
         self.task_listbox = tk.Listbox(self.task_frame, height=8, borderwidth=0, highlightthickness=0, relief=tk.FLAT, selectmode=tk.SINGLE)
-        self.task_listbox.grid(row=1, column=0, columnspan=2, padx=10, pady=5, sticky="nsew")
+        self.task_listbox.grid(row=2, column=0, columnspan=2, padx=10, pady=5, sticky="nsew")
         # Style applied later by _apply_theme_to_widgets
 
         self.task_scrollbar = ctk.CTkScrollbar(self.task_frame, command=self.task_listbox.yview) # Style applied later
-        self.task_scrollbar.grid(row=1, column=2, padx=(0,10), pady=5, sticky="ns")
+        self.task_scrollbar.grid(row=2, column=2, padx=(0,10), pady=5, sticky="ns")
         self.task_listbox.configure(yscrollcommand=self.task_scrollbar.set)
+        self.task_listbox_ids = [] # Task IDs in listbox row order
         self.refresh_task_listbox()
 
         # Add/Remove Task Frame
         self.task_actions_frame = ctk.CTkFrame(self.task_frame, fg_color="transparent")
-        self.task_actions_frame.grid(row=2, column=0, columnspan=3, padx=10, pady=5, sticky="ew")
+        self.task_actions_frame.grid(row=3, column=0, columnspan=3, padx=10, pady=5, sticky="ew")
         self.task_actions_frame.grid_columnconfigure(0, weight=1)
 
         self.task_entry = self._create_styled_entry(self.task_actions_frame, placeholder="Enter new task...")
         self.task_entry.grid(row=0, column=0, padx=(0, 5), pady=5, sticky="ew")
         self.task_entry.bind("<Return>", self.add_task_action)
 
+        self.task_priority_var = ctk.StringVar(value=TASK_PRIORITIES[DEFAULT_TASK_PRIORITY])
+        self.task_priority_menu = self._create_styled_option_menu(self.task_actions_frame, values=list(TASK_PRIORITIES.values()), variable=self.task_priority_var, width=90)
+        self.task_priority_menu.grid(row=0, column=1, padx=5, pady=5)
         self.add_task_button = self._create_styled_button(self.task_actions_frame, text="Add Task", width=100, command=self.add_task_action)
-        self.add_task_button.grid(row=0, column=1, padx=5, pady=5)
+        self.add_task_button.grid(row=0, column=2, padx=5, pady=5)
         self.remove_task_button = self._create_styled_button(self.task_actions_frame, text="Remove", width=100, command=self.remove_task_action, color_key="button_secondary", hover_key="button_secondary_hover")
-        self.remove_task_button.grid(row=0, column=2, padx=5, pady=5)
+        self.remove_task_button.grid(row=0, column=3, padx=5, pady=5)
 
 
     def _create_blocked_sites_tab(self):
@@ -563,6 +1443,28 @@ class FocusAppGUI(ctk.CTk):
         self.remove_site_button.grid(row=0, column=2, padx=5, pady=5)
 
 
+    def _create_statistics_tab(self):
+        """Creates widgets for the Statistics tab."""
+        self.tab_stats = self.tab_view.tab("Statistics")
+        self.tab_stats.configure(fg_color=self.current_theme_colors["background"])
+        self.tab_stats.grid_columnconfigure(0, weight=1)
+        self.tab_stats.grid_rowconfigure(1, weight=1)
+
+        self.stats_summary_frame = self._create_styled_frame(self.tab_stats)
+        self.stats_summary_frame.grid(row=0, column=0, padx=10, pady=10, sticky="ew")
+        self.stats_summary_frame.grid_columnconfigure(0, weight=1)
+        self.stats_summary_label = self._create_styled_label(self.stats_summary_frame, text="", size=FONT_SIZE_NORMAL, weight="bold")
+        self.stats_summary_label.grid(row=0, column=0, padx=10, pady=10)
+
+        self.stats_textbox = ctk.CTkTextbox(self.tab_stats,
+                                            state=tk.DISABLED,
+                                            wrap=tk.NONE,
+                                            font=(FONT_FAMILY, FONT_SIZE_NORMAL),
+                                            corner_radius=CORNER_RADIUS,
+                                            border_width=BORDER_WIDTH) # Style applied later
+        self.stats_textbox.grid(row=1, column=0, padx=10, pady=(0, 10), sticky="nsew")
+        self.refresh_statistics()
+
     def _create_activity_log_tab(self):
         """Creates widgets for the Activity Log tab."""
         self.tab_log = self.tab_view.tab("Activity Log")
@@ -599,6 +1501,7 @@ class FocusAppGUI(ctk.CTk):
             add_log_message(f"Warning: Could not apply full theme to listbox: {e}", level="warning")
 
 
+    @profiled("toggle_theme")
     def toggle_theme(self):
         """Switches between light and dark themes."""
         global active_theme_name
@@ -632,6 +1535,7 @@ class FocusAppGUI(ctk.CTk):
          self.configure(fg_color=theme["background"])
          if hasattr(self, 'tab_focus'): self.tab_focus.configure(fg_color=theme["background"])
          if hasattr(self, 'tab_sites'): self.tab_sites.configure(fg_color=theme["background"])
+         if hasattr(self, 'tab_stats'): self.tab_stats.configure(fg_color=theme["background"])
          if hasattr(self, 'tab_log'): self.tab_log.configure(fg_color=theme["background"])
 
          # --- Re-configure CTk Widgets with Explicit Colors ---
@@ -653,6 +1557,7 @@ class FocusAppGUI(ctk.CTk):
          if hasattr(self, 'status_frame'): self.status_frame.configure(fg_color=theme["frame"], border_color=theme["border"])
          if hasattr(self, 'task_frame'): self.task_frame.configure(fg_color=theme["frame"], border_color=theme["border"])
          if hasattr(self, 'sites_list_frame'): self.sites_list_frame.configure(fg_color=theme["frame"], border_color=theme["border"])
+         if hasattr(self, 'stats_summary_frame'): self.stats_summary_frame.configure(fg_color=theme["frame"], border_color=theme["border"])
 
          # Labels (Created with helper) - Text color only
          if hasattr(self, 'status_label'): self.status_label.configure(text_color=theme["status_focus"] if self.is_running else theme["text"])
@@ -663,6 +1568,7 @@ class FocusAppGUI(ctk.CTk):
          if hasattr(self, 'duration_entry'): self.duration_entry.configure(fg_color=theme["widget_bg"], text_color=theme["text"], placeholder_text_color=theme["text_light"], border_color=theme["border"])
          if hasattr(self, 'reminder_entry'): self.reminder_entry.configure(fg_color=theme["widget_bg"], text_color=theme["text"], placeholder_text_color=theme["text_light"], border_color=theme["border"])
          if hasattr(self, 'task_entry'): self.task_entry.configure(fg_color=theme["widget_bg"], text_color=theme["text"], placeholder_text_color=theme["text_light"], border_color=theme["border"])
+         if hasattr(self, 'task_filter_entry'): self.task_filter_entry.configure(fg_color=theme["widget_bg"], text_color=theme["text"], placeholder_text_color=theme["text_light"], border_color=theme["border"])
          if hasattr(self, 'site_entry'): self.site_entry.configure(fg_color=theme["widget_bg"], text_color=theme["text"], placeholder_text_color=theme["text_light"], border_color=theme["border"])
 
          # Buttons (Created with helper)
@@ -673,16 +1579,22 @@ class FocusAppGUI(ctk.CTk):
          if hasattr(self, 'add_site_button'): self.add_site_button.configure(fg_color=theme["button"], hover_color=theme["button_hover"], border_color=theme["border"], text_color=theme["text"])
          if hasattr(self, 'remove_site_button'): self.remove_site_button.configure(fg_color=theme["button_secondary"], hover_color=theme["button_secondary_hover"], border_color=theme["border"], text_color=theme["text"])
 
+         # Option Menus
+         if hasattr(self, 'task_priority_menu'): self.task_priority_menu.configure(fg_color=theme["button"], button_color=theme["button_hover"], button_hover_color=theme["button_hover"], text_color=theme["text"], dropdown_fg_color=theme["widget_bg"], dropdown_text_color=theme["text"], dropdown_hover_color=theme["accent"])
+
          # Scrollbars
          if hasattr(self, 'task_scrollbar'): self.task_scrollbar.configure(button_color=theme["scrollbar_button"], button_hover_color=theme["scrollbar_button_hover"], fg_color=theme["frame"])
          if hasattr(self, 'sites_scrollbar'): self.sites_scrollbar.configure(button_color=theme["scrollbar_button"], button_hover_color=theme["scrollbar_button_hover"], fg_color=theme["frame"])
 
          # Log Textbox
          if hasattr(self, 'log_textbox'): self.log_textbox.configure(fg_color=theme["widget_bg"], text_color=theme["text"], border_color=theme["border"])
+         if hasattr(self, 'stats_textbox'): self.stats_textbox.configure(fg_color=theme["widget_bg"], text_color=theme["text"], border_color=theme["border"])
+         if hasattr(self, 'stats_summary_label'): self.stats_summary_label.configure(text_color=theme["text"])
 
          # Theme Switch itself
          if hasattr(self, 'theme_label'): self.theme_label.configure(text_color=theme["text"])
          if hasattr(self, 'theme_switch'): self.theme_switch.configure(progress_color=theme["button_hover"], fg_color=theme["button_secondary"], button_color=theme["button"], button_hover_color=theme["button_hover"], text_color=theme["text"])
+         if hasattr(self, 'profile_switch'): self.profile_switch.configure(progress_color=theme["button_hover"], fg_color=theme["button_secondary"], button_color=theme["button"], button_hover_color=theme["button_hover"], text_color=theme["text"])
 
          # --- Manually Re-configure tk Widgets ---
          if hasattr(self, 'task_listbox'): self._configure_listbox_style(self.task_listbox)
@@ -694,115 +1606,124 @@ class FocusAppGUI(ctk.CTk):
     # --- UI Actions (Tasks & Sites - Logging included) ---
     # (These functions remain the same logic as v3, just ensure they use add_log_message)
     def add_task_action(self, event=None):
-        global current_tasks
         task = self.task_entry.get().strip()
         if task:
-            if task not in current_tasks:
-                add_log_message(f"Task added: '{task}'")
-                current_tasks.append(task)
-                self.task_listbox.insert(tk.END, task)
+            if not task_store.contains_text(task):
+                priority = next((p for p, label in TASK_PRIORITIES.items() if label == self.task_priority_var.get()), DEFAULT_TASK_PRIORITY)
+                add_log_message(f"Task added: '{task}' ({TASK_PRIORITIES[priority]} priority)")
+                task_store.add(task, priority)
+                publish_session_state(tasks=task_store.ordered())
+                self.refresh_task_listbox()
                 self.task_entry.delete(0, tk.END)
-                save_list_to_file(TASKS_FILENAME, current_tasks)
+                save_task_store()
             else: tkinter.messagebox.showinfo("Duplicate Task", "This task is already in the list.")
         else: tkinter.messagebox.showwarning("Empty Task", "Please enter a task description.")
 
     def remove_task_action(self):
-        global current_tasks
         selected_indices = self.task_listbox.curselection()
         if selected_indices:
             index = selected_indices[0]
-            task_to_remove = self.task_listbox.get(index)
-            add_log_message(f"Task removed: '{task_to_remove}'")
-            current_tasks.remove(task_to_remove)
+            task_to_remove = task_store.remove(self.task_listbox_ids[index])
+            if task_to_remove: add_log_message(f"Task removed: '{task_to_remove.text}'")
+            publish_session_state(tasks=task_store.ordered())
+            del self.task_listbox_ids[index]
             self.task_listbox.delete(index)
-            save_list_to_file(TASKS_FILENAME, current_tasks)
+            save_task_store()
         else: tkinter.messagebox.showwarning("No Selection", "Please select a task to remove.")
 
     def add_site_action(self, event=None):
-        global websites_to_block
-        site = self.site_entry.get().strip().lower()
-        if site and ('.' in site and not site.startswith('.') and not site.endswith('.')):
-            site = re.sub(r'^https?://', '', site)
+        site = self.site_entry.get().strip()
+        if not site.startswith("re:"): site = re.sub(r'^https?://', '', site.lower()) # Regex rules keep their case
+        if not site.startswith("re:") and "*" not in site and re.search(r'[?#]', site): # Queries only ever see host/path
+            add_log_message(f"Dropped the query string/fragment from '{site}'.", level="info")
+            site = re.split(r'[?#]', site, 1)[0].rstrip('/')
+        rule_kind = parse_block_rule(site)[0] if site else None
+        if rule_kind == "regex" and not is_valid_block_rule(site): tkinter.messagebox.showwarning("Invalid Pattern", f"'{site}' is not a valid pattern.")
+        elif site and (rule_kind in ("keyword", "regex") or ('.' in site and not site.startswith('.') and not site.endswith('.'))):
+            websites = set(session_state.websites)
             added_list = []
             # Add the entered site if not present
-            if site not in websites_to_block:
-                 websites_to_block.append(site)
+            if site not in websites:
                  added_list.append(site)
-            # Determine the www/non-www counterpart
-            www_site = f"www.{site}" if not site.startswith("www.") else site[4:]
+            # Determine the www/non-www counterpart (hostnames and host/path rules only)
+            www_site = site
+            if rule_kind in ("host", "prefix"): www_site = f"www.{site}" if not site.startswith("www.") else site[4:]
             # Add the counterpart only if it's different and not already present
-            if www_site != site and www_site not in websites_to_block:
-                 websites_to_block.append(www_site)
+            if www_site != site and www_site not in websites:
                  added_list.append(www_site)
 
             if added_list:
                 add_log_message(f"Blocked site(s) added: {', '.join(added_list)}")
-                websites_to_block.sort()
+                new_state = publish_session_state(websites=websites.union(added_list))
                 self.refresh_sites_listbox()
                 self.site_entry.delete(0, tk.END)
-                save_list_to_file(BLOCKED_SITES_FILENAME, websites_to_block)
+                save_list_to_file(BLOCKED_SITES_FILENAME, new_state.websites)
             else: tkinter.messagebox.showinfo("Duplicate Site", f"'{site}' (and its www/non-www variant) is already in the block list.")
         elif not site: tkinter.messagebox.showwarning("Empty Site", "Please enter a website URL.")
-        else: tkinter.messagebox.showwarning("Invalid Format", "Please enter a valid website domain (e.g., www.example.com or example.com).")
+        else: tkinter.messagebox.showwarning("Invalid Format", "Please enter a valid website domain (e.g., www.example.com or example.com), a host/path (reddit.com/r/all) or a pattern (*shorts*, re:...).")
 
     def remove_site_action(self):
-        global websites_to_block
         selected_indices = self.sites_listbox.curselection()
         if selected_indices:
+            websites = set(session_state.websites)
             removed_list = []
             indices_to_remove = sorted(selected_indices, reverse=True)
             for index in indices_to_remove:
                 site_to_remove = self.sites_listbox.get(index)
-                if site_to_remove in websites_to_block:
-                    websites_to_block.remove(site_to_remove)
+                if site_to_remove in websites:
+                    websites.discard(site_to_remove)
                     self.sites_listbox.delete(index)
                     removed_list.append(site_to_remove)
             if removed_list:
                  add_log_message(f"Blocked site(s) removed: {', '.join(removed_list)}")
-                 save_list_to_file(BLOCKED_SITES_FILENAME, websites_to_block)
+                 new_state = publish_session_state(websites=websites)
+                 save_list_to_file(BLOCKED_SITES_FILENAME, new_state.websites)
         else: tkinter.messagebox.showwarning("No Selection", "Please select one or more sites to remove.")
 
     def refresh_task_listbox(self):
+        query = self.task_filter_entry.get() if hasattr(self, 'task_filter_entry') else ""
+        tasks = task_store.search(query)
         self.task_listbox.delete(0, tk.END)
-        for task in current_tasks: self.task_listbox.insert(tk.END, task)
+        self.task_listbox_ids = [task.task_id for task in tasks]
+        for task in tasks: self.task_listbox.insert(tk.END, f"[{TASK_PRIORITIES[task.priority]}] {task.text}")
 
     def refresh_sites_listbox(self):
         self.sites_listbox.delete(0, tk.END)
-        websites_to_block.sort()
-        for site in websites_to_block: self.sites_listbox.insert(tk.END, site)
+        for site in session_state.websites: self.sites_listbox.insert(tk.END, site)
 
     # --- UI Actions (Focus Session - Logging included) ---
+    @profiled("start_action")
     def start_action(self):
-        global scheduler_thread, stop_scheduler, websites_to_block
         if self.is_running: return
         try:
             duration_min = int(self.duration_entry.get()); reminder_min = int(self.reminder_entry.get())
             if duration_min <= 0 or reminder_min <= 0: raise ValueError()
         except ValueError: tkinter.messagebox.showerror("Invalid Input", "Please enter valid positive numbers for duration and reminder."); return
         if platform.system() == "Windows" and not is_admin(): tkinter.messagebox.showerror("Admin Required", "Administrator privileges needed to block websites.\nPlease restart as Administrator."); return
-        if not websites_to_block: add_log_message("Start cancelled: Blocked sites list is empty.", level="warning"); tkinter.messagebox.showwarning("No Sites Blocked", "Your blocked sites list is empty. Add sites first."); return
-        if not block_websites_action(): add_log_message("Session start failed: Could not apply website blocks.", level="error"); return
+        if not session_state.websites: add_log_message("Start cancelled: Blocked sites list is empty.", level="warning"); tkinter.messagebox.showwarning("No Sites Blocked", "Your blocked sites list is empty. Add sites first."); return
+        if not any(is_host_rule(site) for site in session_state.websites):
+            add_log_message("Start cancelled: Blocked sites list has no plain hostnames.", level="warning")
+            tkinter.messagebox.showwarning("No Sites Blocked", "Your blocked sites list only has pattern rules (paths, wildcards or re:).\nThese only apply to the query service, not the hosts file. Add at least one hostname first."); return
+        session = FocusSession(duration_min, reminder_min)
+        if not session.start(): add_log_message("Session start failed: Could not apply website blocks.", level="error"); return
 
         add_log_message(f"Focus session started (Duration: {duration_min} min, Reminder: {reminder_min} min).")
+        self.session = session
         self.is_running = True; self._update_ui_state()
-        schedule.clear(); schedule.every(reminder_min).minutes.do(send_task_reminder); send_task_reminder()
-        stop_scheduler.clear(); scheduler_thread = threading.Thread(target=run_scheduler, daemon=True); scheduler_thread.start()
-        self.session_end_time = time.time() + duration_min * 60; self.update_timer()
+        self._timer_expected_at = None; self.update_timer()
 
+    @profiled("stop_action")
     def stop_action(self, ended_naturally=False):
-        global scheduler_thread, stop_scheduler
         if not self.is_running: return
         log_reason = "completed" if ended_naturally else "stopped by user"; add_log_message(f"Focus session {log_reason}.")
-        stop_scheduler.set(); schedule.clear()
-        if platform.system() == "Windows":
-            if is_admin():
-                 if not unblock_websites_action(): tkinter.messagebox.showwarning("Unblock Failed", "Could not automatically restore hosts file. Check log/permissions.")
-            else: add_log_message("Cannot unblock websites without Admin rights.", level="warning"); tkinter.messagebox.showwarning("Admin Required", "Admin rights needed to unblock websites. Restart as Admin or check hosts file manually.")
+        if not can_edit_hosts():
+            add_log_message("Cannot unblock websites without Admin rights.", level="warning"); tkinter.messagebox.showwarning("Admin Required", "Admin rights needed to unblock websites. Restart as Admin or check hosts file manually.")
+            self.session.stop(restore_hosts=False)
+        elif not self.session.stop(): tkinter.messagebox.showwarning("Unblock Failed", "Could not automatically restore hosts file. Check log/permissions.")
+        self._record_session(self.session, ended_naturally)
         self.is_running = False; self._update_ui_state()
-        self.session_end_time = None; self.timer_label.configure(text="")
-        if scheduler_thread and scheduler_thread.is_alive():
-            add_log_message("Waiting for scheduler thread..."); scheduler_thread.join(timeout=2.0)
-            if scheduler_thread.is_alive(): add_log_message("Warning: Scheduler thread did not stop cleanly.", level="warning")
+        if self._timer_job: self.after_cancel(self._timer_job); self._timer_job = None
+        self.session = None; self.timer_label.configure(text="")
         add_log_message("Focus session ended.")
 
     def _update_ui_state(self):
@@ -819,24 +1740,94 @@ class FocusAppGUI(ctk.CTk):
         if hasattr(self, 'reminder_entry'): self.reminder_entry.configure(state=state)
 
         # Task Controls
+        if hasattr(self, 'task_filter_entry'): self.task_filter_entry.configure(state=state)
         if hasattr(self, 'task_entry'): self.task_entry.configure(state=state)
+        if hasattr(self, 'task_priority_menu'): self.task_priority_menu.configure(state=state)
         if hasattr(self, 'add_task_button'): self.add_task_button.configure(state=state)
         if hasattr(self, 'remove_task_button'): self.remove_task_button.configure(state=state)
         if hasattr(self, 'task_listbox'): self.task_listbox.configure(state=state)
 
     def update_timer(self):
-        if self.is_running and self.session_end_time:
-            remaining_seconds = int(self.session_end_time - time.time())
-            if remaining_seconds > 0:
-                minutes, seconds = divmod(remaining_seconds, 60)
-                self.timer_label.configure(text=f"~ {minutes:02d}:{seconds:02d} remaining ~")
-                self.after(1000, self.update_timer)
+        """Redraws the countdown when its displayed second changes (only while visible) and ends
+        the session at its deadline. Times come from the session's monotonic clock, so redraw
+        delays never accumulate and wall-clock changes don't matter."""
+        self._timer_job = None
+        if self.is_running and self.session:
+            now = self.session.clock.monotonic()
+            if self._timer_expected_at is not None and now - self._timer_expected_at > SUSPEND_GAP_SECONDS:
+                add_log_message(f"Timer woke {now - self._timer_expected_at:.0f}s late (system suspended?); catching up.", level="warning")
+            remaining = self.session.remaining()
+            if remaining > 0:
+                if self.timer_label.winfo_viewable():
+                    minutes, seconds = divmod(math.ceil(remaining), 60)
+                    self.timer_label.configure(text=f"~ {minutes:02d}:{seconds:02d} remaining ~")
+                    delay = remaining - math.floor(remaining) or 1.0 # Until the next whole second
+                else: delay = min(remaining, HIDDEN_TIMER_POLL_SECONDS) # No redraws while hidden, still end on time
+                self._timer_expected_at = now + delay
+                self._timer_job = self.after(int(delay * 1000) + TIMER_ALIGN_SLACK_MS, self.update_timer)
             else:
                 self.timer_label.configure(text="Session Complete! ✨")
                 self.stop_action(ended_naturally=True)
         elif hasattr(self, 'timer_label'): # Ensure label exists before configuring
              self.timer_label.configure(text="")
 
+    def _on_tab_changed(self):
+        """Tab view callback: the new tab is only mapped at idle time, so let that happen first."""
+        self.update_idletasks()
+        self._reschedule_timer()
+
+    def _reschedule_timer(self):
+        """Runs update_timer now instead of at its pending (possibly hidden-mode) time."""
+        if not (self.is_running and self._timer_job): return
+        self.after_cancel(self._timer_job)
+        self._timer_expected_at = None
+        self.update_timer()
+
+
+    def _record_session(self, session, completed):
+        if not session_analytics or session.started_at is None: return
+        try:
+            session_analytics.record_session(session.started_at, session.clock.now(), session.duration, session.elapsed(),
+                                             session.reminder_count, session.profile, completed)
+            add_log_message(f"Session recorded ({session.elapsed() / 60:.0f} of {session.duration / 60:.0f} min).")
+        except sqlite3.Error as e:
+            add_log_message(f"Error recording session: {e}", level="error")
+        self.refresh_statistics()
+
+    def refresh_statistics(self):
+        """Fills the Statistics tab from the rollup tables (no per-session scans)."""
+        if not hasattr(self, 'stats_textbox'): return
+        if not session_analytics:
+            self.stats_summary_label.configure(text="Statistics unavailable (see Activity Log).")
+            return
+        try:
+            today = datetime.fromtimestamp(clock.now()).date()
+            week_start = today - timedelta(days=today.weekday())
+            def summary(first_day):
+                sessions, seconds = session_analytics.totals_between(first_day, today)
+                return f"{seconds / 60:.0f} min ({sessions} sessions)"
+            self.stats_summary_label.configure(text=f"Today: {summary(today)}    This week: {summary(week_start)}\n"
+                                                    f"Last 30 days: {summary(today - timedelta(days=29))}    Last 365 days: {summary(today - timedelta(days=364))}")
+            lines = [f"Last {STATS_DAYS_SHOWN} days"]
+            first_day = today - timedelta(days=STATS_DAYS_SHOWN - 1)
+            daily = session_analytics.daily_totals(first_day, today)
+            for offset in range(STATS_DAYS_SHOWN):
+                day = today - timedelta(days=offset)
+                sessions, seconds = daily.get(day, (0, 0.0))
+                lines.append(f"  {day.strftime('%a %Y-%m-%d')}   {seconds / 60:6.0f} min   {sessions} sessions")
+            lines.append(f"\nLast {STATS_WEEKS_SHOWN} weeks")
+            weekly = session_analytics.weekly_totals(week_start - timedelta(weeks=STATS_WEEKS_SHOWN - 1), today)
+            for offset in range(STATS_WEEKS_SHOWN):
+                week = iso_week_key(week_start - timedelta(weeks=offset))
+                sessions, seconds = weekly.get(week, (0, 0.0))
+                lines.append(f"  {week}   {seconds / 60:6.0f} min   {sessions} sessions")
+        except sqlite3.Error as e:
+            add_log_message(f"Error loading statistics: {e}", level="error")
+            return
+        self.stats_textbox.configure(state=tk.NORMAL)
+        self.stats_textbox.delete("1.0", tk.END)
+        self.stats_textbox.insert("1.0", "\n".join(lines))
+        self.stats_textbox.configure(state=tk.DISABLED)
 
     def update_log_display(self):
         if not hasattr(self, 'log_textbox') or not self.log_textbox.winfo_exists(): return
@@ -859,15 +1850,28 @@ class FocusAppGUI(ctk.CTk):
                 self.destroy()
             else: add_log_message("Close cancelled by user."); return
         else:
-            if scheduler_thread and scheduler_thread.is_alive(): stop_scheduler.set(); scheduler_thread.join(timeout=1.0)
             add_log_message("Exiting application.")
             self.destroy()
 
 # --- Main Execution ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Focus Friend - block distracting websites during focus sessions.")
+    parser.add_argument("--query-service", action="store_true", help=f"Answer 'is this host blocked?' queries on {QUERY_SERVICE_HOST}")
+    parser.add_argument("--query-port", type=int, default=QUERY_SERVICE_PORT, help="Loopback TCP port for the query service")
+    parser.add_argument("--query-socket", metavar="PATH", help="Serve queries on a Unix socket instead of TCP (not on Windows)")
+    parser.add_argument("--profile", action="store_true", help="Profile startup and session/theme transitions into files next to the script")
+    args = parser.parse_args()
+    if args.profile: set_profiling(True)
+
     if platform.system() == "Windows":
         try: ctypes.windll.shcore.SetProcessDpiAwareness(1)
         except Exception as e: print(f"Note: Could not set DPI awareness ({e}).")
 
     app = FocusAppGUI()
+    query_service = None
+    if args.query_service or args.query_socket:
+        query_service = BlockQueryService()
+        query_service.start(port=args.query_port, unix_path=args.query_socket)
     app.mainloop()
+    if query_service: query_service.stop()
+    if session_analytics: session_analytics.close()
@@ -0,0 +1,106 @@
+"""Benchmark for the compiled block rule matcher.
+
+Generates a synthetic block list (hostnames, host/path prefixes, keywords, globs and regexes),
+checks that BlockRuleMatcher agrees with naive rule-by-rule iteration, and compares their speed
+and the cost of an incremental update against a full rebuild.
+
+    python matcher_benchmark.py --rules 5000 --queries 20000
+"""
+import argparse
+import random
+import re
+import time
+
+import focus_friend as ff
+
+WORDS = ["news", "video", "shorts", "feed", "games", "chat", "live", "clips", "memes", "sport", "music", "shop"]
+TLDS = ["com", "net", "org", "tv", "io"]
+
+def make_host(rng):
+    return f"{rng.choice(WORDS)}{rng.randrange(100000)}.{rng.choice(TLDS)}"
+
+def make_rules(count, rng):
+    rules = set()
+    while len(rules) < count:
+        roll = rng.random()
+        if roll < 0.70: rules.add(make_host(rng))
+        elif roll < 0.85: rules.add(f"{make_host(rng)}/{rng.choice(WORDS)}/{rng.randrange(100)}")
+        elif roll < 0.95: rules.add(f"*{rng.choice(WORDS)}{rng.randrange(10000)}*")
+        elif roll < 0.98: rules.add(f"*.{make_host(rng)}*")
+        else: # Mixed case on purpose: regex rules keep their case but must match lowercased targets
+            word = rng.choice(WORDS)
+            rules.add(f"re:^{word.capitalize() if rng.random() < 0.5 else word}{rng.randrange(10000)}\\.(com|net)/\\d+$")
+    return sorted(rules)
+
+def make_queries(count, rules, rng):
+    """Roughly a third of the queries hit a rule; the rest are random URLs."""
+    hosts = [rule for rule in rules if ff.is_host_rule(rule)]
+    prefixes = [rule for rule in rules if ff.parse_block_rule(rule)[0] == "prefix"]
+    regex_hosts = [rule[4:].split("\\.", 1)[0].lower() for rule in rules if rule.startswith("re:^")]
+    queries = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.15 and hosts: queries.append(f"https://{rng.choice(hosts)}/watch?v={rng.randrange(1000)}")
+        elif roll < 0.25 and prefixes: queries.append(f"https://{rng.choice(prefixes)}/more")
+        elif roll < 0.30 and regex_hosts: queries.append(f"https://{rng.choice(regex_hosts)}.com/{rng.randrange(1000)}")
+        else: queries.append(f"https://{make_host(rng)}/{rng.choice(WORDS)}/{rng.randrange(100000)}")
+    return queries
+
+def compile_naive(rules):
+    """Parses every rule once up front so the naive loop only pays for matching."""
+    compiled = []
+    for rule in rules:
+        kind, value = ff.parse_block_rule(rule)
+        compiled.append((kind, re.compile(value, re.IGNORECASE) if kind == "regex" else value))
+    return compiled
+
+def naive_match(compiled, target):
+    if not target: return False
+    host = target.split("/", 1)[0]
+    for kind, value in compiled:
+        if kind == "host" and host == value: return True
+        if kind == "prefix" and target.startswith(value) and target[len(value):len(value) + 1] in ("", "/"): return True
+        if kind == "keyword" and value in target: return True
+        if kind == "regex" and value.search(target): return True
+    return False
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the compiled block rule matcher against naive iteration.")
+    parser.add_argument("--rules", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    rules = make_rules(args.rules, rng)
+    targets = [ff.normalize_query_target(query) for query in make_queries(args.queries, rules, rng)]
+
+    matcher = ff.BlockRuleMatcher()
+    _, build_time = timed(matcher.update, rules)
+    matcher.match("warm.up/") # Links the automaton and compiles the merged regex
+    compiled_naive = compile_naive(rules)
+
+    fast, fast_time = timed(lambda: [matcher.match(target) is not None for target in targets])
+    slow, slow_time = timed(lambda: [naive_match(compiled_naive, target) for target in targets])
+    mismatches = sum(a != b for a, b in zip(fast, slow))
+
+    print(f"Rules: {len(rules)}, queries: {len(targets)}, blocked: {sum(fast)}, mismatches vs naive: {mismatches}")
+    print(f"Naive iteration:  {slow_time:.3f}s ({len(targets) / slow_time:,.0f} queries/s)")
+    print(f"Compiled matcher: {fast_time:.3f}s ({len(targets) / fast_time:,.0f} queries/s), {slow_time / fast_time:.0f}x faster")
+
+    edited = rules[10:] + make_rules(10, random.Random(args.seed + 1))
+    _, update_time = timed(lambda: (matcher.update(edited), matcher.match("warm.up/")))
+    def rebuild():
+        fresh = ff.BlockRuleMatcher()
+        fresh.update(edited); fresh.match("warm.up/")
+    _, rebuild_time = timed(rebuild)
+    print(f"Build: {build_time * 1000:.1f} ms, incremental update (10 removed, 10 added): {update_time * 1000:.1f} ms, full rebuild: {rebuild_time * 1000:.1f} ms")
+    if mismatches: raise SystemExit("Compiled matcher disagrees with naive iteration!")
+
+if __name__ == "__main__":
+    main()
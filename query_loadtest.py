@@ -0,0 +1,105 @@
+"""Load test for the Focus Friend query service.
+
+Starts the service in-process (or targets a running app with --connect) and sends batched
+host/URL queries from several concurrent connections, while a background thread keeps
+starting/stopping sessions and editing the block list. Reports queries per second.
+
+    python query_loadtest.py --connections 8 --batch 50 --duration 10
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import threading
+import time
+
+import focus_friend as ff
+
+SAMPLE_UNBLOCKED = ["github.com", "docs.python.org", "stackoverflow.com", "www.wikipedia.org", "news.ycombinator.com"]
+
+def build_queries(count, rng):
+    """Returns a mix of bare hosts and URLs, blocked and not, with repeats (like real browsing)."""
+    hosts = list(ff.default_websites_to_block) + SAMPLE_UNBLOCKED
+    queries = []
+    for _ in range(count):
+        host = rng.choice(hosts)
+        if rng.random() < 0.5: queries.append(f"https://{host}/page/{rng.randrange(20)}")
+        else: queries.append(host)
+    return queries
+
+def churn_sessions(stop_event, interval, stats):
+    """Simulates session start/stop and block list edits while queries are being served."""
+    rng = random.Random(1)
+    while not stop_event.is_set():
+        ff.publish_session_state(active=True)
+        extra = f"site{rng.randrange(100)}.example.com"
+        ff.publish_session_state(websites=ff.session_state.websites + (extra,))
+        stop_event.wait(interval)
+        ff.publish_session_state(active=False)
+        stats["toggles"] += 1
+        stop_event.wait(interval)
+
+async def run_client(host, port, batch, deadline, seed, latencies):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port, limit=ff.QUERY_MAX_LINE_BYTES)
+    sent = 0
+    try:
+        while time.perf_counter() < deadline:
+            queries = build_queries(batch, rng)
+            started = time.perf_counter()
+            writer.write((json.dumps({"id": sent, "queries": queries}) + "\n").encode("utf-8"))
+            await writer.drain()
+            response = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - started)
+            if len(response.get("blocked", ())) != batch: raise RuntimeError(f"Bad response: {response}")
+            sent += batch
+    finally:
+        writer.close()
+    return sent
+
+async def run_load(host, port, connections, batch, duration):
+    deadline = time.perf_counter() + duration
+    latencies = []
+    counts = await asyncio.gather(*(run_client(host, port, batch, deadline, seed, latencies) for seed in range(connections)))
+    return sum(counts), latencies
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Focus Friend query service.")
+    parser.add_argument("--connect", metavar="HOST:PORT", help="Target a running app instead of an in-process service")
+    parser.add_argument("--connections", type=int, default=8)
+    parser.add_argument("--batch", type=int, default=50, help="Queries per request")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run")
+    parser.add_argument("--churn-interval", type=float, default=0.05, help="Seconds between session start/stop (in-process only)")
+    args = parser.parse_args()
+
+    service = None
+    stop_churn = threading.Event()
+    stats = {"toggles": 0}
+    if args.connect:
+        host, _, port = args.connect.rpartition(":")
+        port = int(port)
+    else:
+        ff.publish_session_state(websites=ff.default_websites_to_block)
+        service = ff.BlockQueryService()
+        host, port = service.start(port=0)[:2]
+        threading.Thread(target=churn_sessions, args=(stop_churn, args.churn_interval, stats), daemon=True).start()
+
+    started = time.perf_counter()
+    total, latencies = asyncio.run(run_load(host, port, args.connections, args.batch, args.duration))
+    elapsed = time.perf_counter() - started
+    stop_churn.set()
+
+    print(f"Queries: {total} in {elapsed:.2f}s -> {total / elapsed:,.0f} queries/s ({len(latencies)} requests)")
+    if latencies:
+        latencies.sort()
+        print(f"Request latency: median {statistics.median(latencies) * 1000:.2f} ms, "
+              f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.2f} ms")
+    if service:
+        lookups = service.cache.hits + service.cache.misses
+        print(f"Session start/stop cycles during test: {stats['toggles']}")
+        print(f"Cache hit rate: {service.cache.hits / lookups:.1%}" if lookups else "Cache hit rate: n/a")
+        service.stop()
+
+if __name__ == "__main__":
+    main()
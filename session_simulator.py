@@ -0,0 +1,114 @@
+"""Headless, accelerated-time simulator for Focus Friend sessions.
+
+Runs many complete sessions (block, reminders, natural end, restore) against a temporary
+hosts file using a SimulatedClock, then reports per-phase timings and checks for leaked
+threads, open files and memory growth.
+
+    python session_simulator.py --sessions 1000 --duration 480 --reminder 25
+"""
+import argparse
+import math
+import os
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import focus_friend as ff
+
+ORIGINAL_HOSTS = "# Simulated hosts file\n127.0.0.1\tlocalhost\n"
+MEMORY_GROWTH_LIMIT = 1024 # Bytes per session after warm-up before we call it a leak
+
+def count_open_files():
+    """Open file descriptors for this process, or None where that can't be read cheaply."""
+    for fd_dir in ("/proc/self/fd", "/dev/fd"):
+        if os.path.isdir(fd_dir): return len(os.listdir(fd_dir))
+    return None
+
+def run_session(sim_clock, duration_min, reminder_min, step, notifications):
+    """Runs one session to its natural end. Returns (phase timings, reminder count)."""
+    timings = {}
+    session = ff.FocusSession(duration_min, reminder_min, notify=notifications.append)
+    started = time.perf_counter()
+    if not session.start(): raise RuntimeError("Session failed to apply blocks (see activity log)")
+    timings["block"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    while not session.is_over():
+        if not sim_clock.settle(1): raise RuntimeError("Scheduler thread did not keep up with the simulated clock")
+        sim_clock.advance(min(step, session.remaining()))
+    sim_clock.settle(1) # Let the scheduler thread see the end (a reminder due exactly then is skipped)
+    timings["run"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    if not session.stop(): raise RuntimeError("Hosts file restore failed (see activity log)")
+    timings["restore"] = time.perf_counter() - started
+    return timings, session.reminder_count
+
+def check_hosts_restored():
+    with open(ff.hosts_path, encoding="utf-8") as f: content = f.read()
+    if content != ORIGINAL_HOSTS: raise RuntimeError("Hosts file was not restored to its original content")
+
+def summarize(name, values):
+    values = sorted(values)
+    p95 = values[max(0, int(len(values) * 0.95) - 1)]
+    return f"{name:<8} mean {statistics.mean(values) * 1000:8.3f} ms   p95 {p95 * 1000:8.3f} ms   max {values[-1] * 1000:8.3f} ms"
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate many Focus Friend sessions at accelerated speed.")
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--duration", type=int, default=480, help="Session length in minutes")
+    parser.add_argument("--reminder", type=int, default=25, help="Reminder interval in minutes")
+    parser.add_argument("--step", type=float, default=60.0, help="Simulated seconds per clock step")
+    parser.add_argument("--tasks", type=int, default=50, help="Tasks in the reminder rotation")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        ff.hosts_path = os.path.join(temp_dir, "hosts")
+        ff.hosts_backup_path = os.path.join(temp_dir, ff.HOSTS_BACKUP_FILENAME)
+        with open(ff.hosts_path, "w", encoding="utf-8") as f: f.write(ORIGINAL_HOSTS)
+        sim_clock = ff.SimulatedClock()
+        ff.set_clock(sim_clock)
+        for i in range(args.tasks): ff.task_store.add(f"Task {i}", 1 + i % 3)
+        ff.publish_session_state(tasks=ff.task_store.ordered(), websites=ff.default_websites_to_block)
+
+        expected_reminders = math.ceil(args.duration / args.reminder) # At the start, then every interval before the end
+        phases = {"block": [], "run": [], "restore": []}
+        reminder_mismatches = 0
+        notifications = []
+        tracemalloc.start()
+        baseline = None
+        started = time.perf_counter()
+        for index in range(args.sessions):
+            timings, reminders = run_session(sim_clock, args.duration, args.reminder, args.step, notifications)
+            check_hosts_restored()
+            for phase, value in timings.items(): phases[phase].append(value)
+            if reminders != expected_reminders: reminder_mismatches += 1
+            notifications.clear()
+            if index == 0: # Baseline after the first session so one-time allocations don't count
+                baseline = (threading.active_count(), count_open_files(), tracemalloc.get_traced_memory()[0])
+        elapsed = time.perf_counter() - started
+        final = (threading.active_count(), count_open_files(), tracemalloc.get_traced_memory()[0])
+        tracemalloc.stop()
+        ff.set_clock(ff.SystemClock())
+
+    simulated_hours = args.sessions * args.duration / 60
+    print(f"Simulated {args.sessions} sessions ({simulated_hours:,.0f} h of focus time) in {elapsed:.2f}s real time "
+          f"({simulated_hours * 3600 / elapsed:,.0f}x speed-up)")
+    for phase, values in phases.items(): print(summarize(phase, values))
+    print(f"Reminders per session: expected {expected_reminders}, mismatched sessions: {reminder_mismatches}")
+
+    leaks = []
+    sessions_after_baseline = max(1, args.sessions - 1)
+    if final[0] > baseline[0]: leaks.append(f"threads {baseline[0]} -> {final[0]}")
+    if baseline[1] is not None and final[1] > baseline[1]: leaks.append(f"open files {baseline[1]} -> {final[1]}")
+    memory_growth = final[2] - baseline[2]
+    if memory_growth > MEMORY_GROWTH_LIMIT * sessions_after_baseline: leaks.append(f"memory +{memory_growth / 1024:.1f} KiB")
+    print(f"Threads: {baseline[0]} -> {final[0]}, open files: {baseline[1]} -> {final[1]}, "
+          f"traced memory: {baseline[2] / 1024:.1f} -> {final[2] / 1024:.1f} KiB")
+    if leaks or reminder_mismatches: raise SystemExit(f"Problems found: {', '.join(leaks) or 'reminder count mismatches'}")
+    print("No leaks detected.")
+
+if __name__ == "__main__":
+    main()